@@ -1,8 +1,27 @@
 # analizador.py
 
+import numpy as np
 from logger import logger
 # 🔥 Ya no se importan las clases de los componentes, se reciben en el init
 
+# Plantillas de la notificación de alerta, construidas una sola vez
+PLANTILLA_ALERTA = (
+    "⚠️ *ALERTA CLIMÁTICA DETECTADA*\n"
+    "Motivo: *{motivo}*\n\n"
+    "🌡️ Temperatura: *{temperatura}°C*\n"
+    "💧 Humedad: *{humedad}%*\n"
+    "🌧️ Lluvia: *{lluvia} mm*"
+)
+PLANTILLA_LINEA_IA = "\n\n🤖 Análisis IA (Prob. de Riesgo): *{prob_ia:.1%}*"
+
+# Texto del motivo según (por_umbral, por_ia)
+MOTIVOS_ALERTA = {
+    (True, True): "Umbrales Superados y Predicción IA",
+    (True, False): "Umbrales Superados",
+    (False, True): "Predicción IA",
+    (False, False): "",
+}
+
 class Analizador:
     """
     Orquesta el análisis de datos, combinando un sistema de reglas basado
@@ -16,43 +35,71 @@ class Analizador:
         self.notifier = notifier
         self.predictor = predictor
         self.umbrales = umbrales
+        self._umbral_ia = umbrales.get('umbral_ia_probabilidad', 0.75)
+        # Si es False, no se consulta la IA cuando las reglas ya disparan la alerta
+        self._ia_con_umbral = umbrales.get('ia_en_alertas_por_umbral', True)
+        self._zona_normal = self._calcular_zona_normal(umbrales.get('margen_zona_normal'))
         logger.info("Analizador Híbrido (Reglas + IA) inicializado.")
 
-    def analizar(self, datos_clima):
+    def _calcular_zona_normal(self, margen):
         """
-        Proceso de análisis híbrido: evalúa reglas y predicciones de IA.
+        Precalcula la "zona normal": temperatura alejada de ambos límites y humedad
+        por debajo del suyo, con un margen relativo. Retorna None si no hay margen configurado.
+        """
+        if margen is None:
+            return None
+        t_min = self.umbrales['limite_temp_min']
+        t_max = self.umbrales['limite_temp_max']
+        holgura = (t_max - t_min) * margen
+        return t_min + holgura, t_max - holgura, self.umbrales['limite_humedad'] * (1 - margen)
+
+    def analizar(self, muestra):
+        """
+        Proceso de análisis híbrido: evalúa reglas y predicciones de IA
+        sobre un WeatherSample entregado por el Colector.
         """
         try:
+            t = muestra.temperatura
+            h = muestra.humedad
+            l = muestra.lluvia
+
             # --- Evaluación por Reglas de Umbrales ---
+            # Se evalúan primero las reglas (baratas); el 'or' corta en la primera que se cumple
+            u = self.umbrales
             riesgo_umbral = (
-                datos_clima['temperatura'] >= self.umbrales['limite_temp_max'] or
-                datos_clima['temperatura'] <= self.umbrales['limite_temp_min'] or
-                datos_clima['humedad'] >= self.umbrales['limite_humedad'] or
-                datos_clima['lluvia'] >= self.umbrales['limite_lluvia_mm']
+                t >= u['limite_temp_max'] or
+                t <= u['limite_temp_min'] or
+                h >= u['limite_humedad'] or
+                l >= u['limite_lluvia_mm']
             )
 
+            # En días claramente normales (sin lluvia y lejos de todos los límites)
+            # no merece la pena consultar a la IA
+            if not riesgo_umbral and self._zona_normal and l == 0:
+                t_lo, t_hi, h_max = self._zona_normal
+                if t_lo < t < t_hi and h < h_max:
+                    logger.info("Condiciones normales. No se requiere alerta.")
+                    return
+
             # --- Evaluación Predictiva con IA ---
+            # Sólo se invoca el modelo si las reglas no bastan o si se quiere su probabilidad en el mensaje
             probabilidad_riesgo_ia = 0.0
             riesgo_ia = False
-            if self.predictor.modelo:
-                res_prediccion = self.predictor.predecir(
-                    datos_clima['temperatura'],
-                    datos_clima['humedad'],
-                    datos_clima['lluvia']
-                )
+            if riesgo_umbral and not self._ia_con_umbral:
+                probabilidad_riesgo_ia = None
+            elif self.predictor.modelo:
+                res_prediccion = self.predictor.predecir(t, h, l)
                 if res_prediccion:
                     _, probabilidad_riesgo_ia = res_prediccion
-                    umbral_ia = self.umbrales.get('umbral_ia_probabilidad', 0.75)
-                    riesgo_ia = probabilidad_riesgo_ia >= umbral_ia
+                    riesgo_ia = probabilidad_riesgo_ia >= self._umbral_ia
             
             # --- Decisión Final y Acción ---
             if riesgo_umbral or riesgo_ia:
-                mensaje = self._construir_mensaje_alerta(datos_clima, riesgo_umbral, riesgo_ia, probabilidad_riesgo_ia)
+                mensaje = self._construir_mensaje_alerta(muestra, riesgo_umbral, riesgo_ia, probabilidad_riesgo_ia)
                 
                 # Guardar el clima en el histórico y obtener su ID
                 clima_id = self.db.insert_historico_clima(
-                    datos_clima['timestamp'], datos_clima['temperatura'], datos_clima['humedad'],
-                    datos_clima['lluvia'], datos_clima['clima'], datos_clima.get('viento_kmh', 0)
+                    muestra.timestamp, t, h, l, muestra.clima, muestra.viento_kmh
                 )
 
                 if clima_id:
@@ -80,35 +127,37 @@ class Analizador:
         logger.info("Analizando pronóstico extendido...")
         try:
             # Analizamos el pronóstico para los próximos 2 días
-            for dia in pronostico_diario[:2]: 
+            dias = pronostico_diario[:2]
+            # Se comparan todas las lluvias de una vez y sólo se recorren los días que superan el umbral
+            lluvias = np.fromiter((dia.get('lluvia', 0) for dia in dias), dtype=np.float64, count=len(dias))
+            # Usamos el mismo umbral de lluvia, o podríamos crear uno nuevo en config.yaml
+            for i in np.flatnonzero(lluvias >= self.umbrales['limite_lluvia_mm']):
+                dia = dias[i]
                 fecha_pronostico = dia['fecha']
-                lluvia_prevista = dia.get('lluvia', 0)
-                
-                # Usamos el mismo umbral de lluvia, o podríamos crear uno nuevo en config.yaml
-                if lluvia_prevista >= self.umbrales['limite_lluvia_mm']:
-                    logger.warning(f"Se detectó pronóstico de lluvia significativa ({lluvia_prevista} mm) para el día {fecha_pronostico.strftime('%Y-%m-%d')}.")
-                    
-                    # Llamamos a un nuevo método en el notificador
-                    self.notifier.enviar_alerta_pronostico(
-                        fecha=fecha_pronostico,
-                        lluvia=lluvia_prevista,
-                        descripcion=dia['clima']
-                    )
-                    # Opcional: podríamos guardar esta alerta predictiva en la BD también
+                lluvia_prevista = float(lluvias[i])
+                logger.warning(f"Se detectó pronóstico de lluvia significativa ({lluvia_prevista} mm) para el día {fecha_pronostico.strftime('%Y-%m-%d')}.")
+
+                # Llamamos a un nuevo método en el notificador
+                self.notifier.enviar_alerta_pronostico(
+                    fecha=fecha_pronostico,
+                    lluvia=lluvia_prevista,
+                    descripcion=dia['clima']
+                )
+                # Opcional: podríamos guardar esta alerta predictiva en la BD también
         except Exception as e:
             logger.error(f"Error analizando el pronóstico: {e}", exc_info=True)
 
-    def _construir_mensaje_alerta(self, datos, por_umbral, por_ia, prob_ia):
-        """Función auxiliar para crear el texto de la notificación."""
-        motivo = []
-        if por_umbral: motivo.append("Umbrales Superados")
-        if por_ia: motivo.append("Predicción IA")
-        
-        return (
-            f"⚠️ *ALERTA CLIMÁTICA DETECTADA*\n"
-            f"Motivo: *{' y '.join(motivo)}*\n\n"
-            f"🌡️ Temperatura: *{datos['temperatura']}°C*\n"
-            f"💧 Humedad: *{datos['humedad']}%*\n"
-            f"🌧️ Lluvia: *{datos['lluvia']} mm*\n\n"
-            f"🤖 Análisis IA (Prob. de Riesgo): *{prob_ia:.1%}*"
-        )
+    def _construir_mensaje_alerta(self, muestra, por_umbral, por_ia, prob_ia):
+        """
+        Función auxiliar para crear el texto de la notificación.
+        Si 'prob_ia' es None (la IA no fue consultada) se omite la línea de la IA.
+        """
+        mensaje = PLANTILLA_ALERTA.format_map({
+            'motivo': MOTIVOS_ALERTA[bool(por_umbral), bool(por_ia)],
+            'temperatura': muestra.temperatura,
+            'humedad': muestra.humedad,
+            'lluvia': muestra.lluvia,
+        })
+        if prob_ia is not None:
+            mensaje += PLANTILLA_LINEA_IA.format_map({'prob_ia': prob_ia})
+        return mensaje
@@ -6,9 +6,28 @@ from telegram.ext import Application, CommandHandler, CallbackContext, CallbackQ
 from telegram.constants import ParseMode
 
 # --- Importaciones de otros módulos y librerías estándar ---
-import yaml
+import asyncio
+import re
 from db_manager import DBManager
 from logger import logger
+from config import cargar_config
+
+# Formato del 'callback_data' de los botones de feedback: "feedback:<alerta_id>:<opinion>"
+FEEDBACK_PATTERN = re.compile(r'^feedback:(\d+):(\w+)$')
+# El handler recibe cualquier callback de feedback, incluso mal formado, para poder responder con un error
+FEEDBACK_PREFIX = re.compile(r'^feedback:')
+
+# --- Acceso a la BD (bloqueante, se ejecuta fuera del event loop) ---
+
+def _leer_resumen() -> dict:
+    """Obtiene el resumen de estado desde la BD."""
+    with DBManager() as db:
+        return db.get_status_summary()
+
+def _guardar_feedback(alerta_id: int, opinion: str) -> None:
+    """Registra en la BD el feedback de un usuario."""
+    with DBManager() as db:
+        db.insert_feedback(alerta_id=alerta_id, feedback=opinion)
 
 # --- Funciones de los Handlers (Ahora todas son ASÍNCRONAS) ---
 
@@ -33,9 +52,9 @@ async def status(update: Update, context: CallbackContext) -> None: # <--- CAMBI
     Consulta la base de datos para obtener un resumen del estado del sistema.
     """
     try:
-        with DBManager() as db:
-            summary = db.get_status_summary()
-        
+        # Se consulta en un hilo aparte para no bloquear el event loop del bot
+        summary = await asyncio.to_thread(_leer_resumen)
+
         mensaje = (
             f"📊 *Estado del Sistema:*\n\n"
             f"• Total mediciones registradas: *{summary.get('total', 0)}*\n"
@@ -55,11 +74,12 @@ async def feedback_handler(update: Update, context: CallbackContext) -> None: #
     await query.answer() # <--- CAMBIO: await
 
     try:
-        _, alerta_id_str, opinion = query.data.split(':')
-        alerta_id = int(alerta_id_str)
+        match = FEEDBACK_PATTERN.match(query.data)
+        if not match:
+            raise ValueError(f"callback_data con formato inesperado: '{query.data}'")
+        alerta_id, opinion = int(match[1]), match[2]
         
-        with DBManager() as db:
-            db.insert_feedback(alerta_id=alerta_id, feedback=opinion)
+        await asyncio.to_thread(_guardar_feedback, alerta_id, opinion)
 
         feedback_confirmado = f"✅ Feedback ('{opinion}') registrado. ¡Gracias por tu ayuda!"
         await query.edit_message_text(text=f"{query.message.text_markdown}\n\n*{feedback_confirmado}*", parse_mode=ParseMode.MARKDOWN) # <--- CAMBIO: await
@@ -78,8 +98,7 @@ def main() -> None:
     Construye la aplicación, añade los handlers y la ejecuta.
     """
     try:
-        with open('config.yaml', 'r') as f:
-            config = yaml.safe_load(f)
+        config = cargar_config('config.yaml')
         token = config['telegram_token']
     except (FileNotFoundError, KeyError) as e:
         logger.critical(f"Error fatal: No se pudo cargar el token de Telegram desde config.yaml. {e}")
@@ -90,7 +109,7 @@ def main() -> None:
     application.add_handler(CommandHandler("start", start))
     application.add_handler(CommandHandler("help", start))
     application.add_handler(CommandHandler("status", status))
-    application.add_handler(CallbackQueryHandler(feedback_handler, pattern='^feedback:'))
+    application.add_handler(CallbackQueryHandler(feedback_handler, pattern=FEEDBACK_PREFIX))
 
     logger.info("Bot de Telegram iniciado y listo para recibir comandos 🚀")
     application.run_polling()
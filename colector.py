@@ -1,41 +1,58 @@
 # colector.py
 
 import requests
-import yaml
 from zoneinfo import ZoneInfo, ZoneInfoNotFoundError # <--- CAMBIO: Usando la librería estándar
+from dataclasses import dataclass
 from datetime import datetime
 from db_manager import DBManager
 from logger import logger
+from sesion_http import crear_sesion
 
 class ColectorError(Exception):
     """Excepción personalizada para errores del Colector."""
     pass
 
+@dataclass(slots=True, frozen=True)
+class WeatherSample:
+    """Una medición del clima actual tal como la entrega el Colector."""
+    timestamp: datetime
+    temperatura: float
+    humedad: int
+    lluvia: float = 0.0
+    clima: str = "No disponible"
+    viento_kmh: float = 0.0
+
 class Colector:
     """
     Componente responsable de obtener los datos climáticos actuales desde una API
     y persistirlos en la base de datos.
     """
-    def __init__(self, db_manager: DBManager, api_key: str, lat: float, lon: float, tz_str: str):
+    def __init__(self, db_manager: DBManager, api_key: str, lat: float, lon: float, tz_str: str, tamano_lote: int = 1):
         """
         Inicializa el Colector con sus dependencias (Inyección de Dependencias).
+        'tamano_lote' indica cuántos registros se acumulan antes de escribirlos en la BD.
         """
         self.db = db_manager
         self.api_key = api_key
         self.lat = lat
         self.lon = lon
+        self.tamano_lote = max(1, tamano_lote)
+        self._pending = []
         try:
             self.tz = ZoneInfo(tz_str)
         except ZoneInfoNotFoundError:
             raise ColectorError(f"La zona horaria '{tz_str}' no es válida.")
             
         self.api_base_url = "https://api.openweathermap.org/data/3.0/onecall"
+        # Sesión persistente: evita un handshake TCP+TLS nuevo en cada consulta
+        self.session = crear_sesion()
         logger.info("Colector inicializado correctamente.")
 
-    def obtener_datos_actuales(self) -> dict | None:
+    def obtener_datos(self) -> tuple[WeatherSample | None, list | None]:
         """
-        Obtiene los datos meteorológicos actuales desde la API de OpenWeatherMap.
-        Retorna un diccionario con los datos o None si ocurre un error.
+        Obtiene en una sola petición a la API de OpenWeatherMap el clima actual y
+        el pronóstico diario, ahorrando una segunda llamada (y cuota) para el pronóstico.
+        Retorna (WeatherSample, lista 'daily' sin procesar); cada elemento es None si falla.
         """
         params = {
             "lat": self.lat,
@@ -43,17 +60,20 @@ class Colector:
             "appid": self.api_key,
             "units": "metric",
             "lang": "es",
-            "exclude": "minutely,hourly,daily,alerts"
+            "exclude": "minutely,hourly,alerts"
         }
 
+        diario = None
         try:
-            response = requests.get(self.api_base_url, params=params, timeout=15)
+            response = self.session.get(self.api_base_url, params=params, timeout=(3, 15))
             response.raise_for_status() # Lanza un error para respuestas 4xx o 5xx
-            data = response.json().get('current', {})
+            payload = response.json()
+            diario = payload.get('daily')
+            data = payload.get('current', {})
 
             if not data:
                 logger.error("La respuesta de la API no contiene la sección 'current'.")
-                return None
+                return None, diario
             
             # Análisis seguro de los datos
             weather_info = data.get('weather', [])
@@ -62,51 +82,75 @@ class Colector:
             # Conversión de timestamp usando zoneinfo
             dt_local = datetime.fromtimestamp(data['dt'], tz=self.tz)
 
-            return {
-                'timestamp': dt_local,
-                'temperatura': data.get('temp'),
-                'humedad': data.get('humidity'),
-                'lluvia': data.get('rain', {}).get('1h', 0),
-                'clima': clima,
-                'viento_kmh': data.get('wind_speed', 0) * 3.6
-            }
+            muestra = WeatherSample(
+                timestamp=dt_local,
+                temperatura=data['temp'],
+                humedad=data['humidity'],
+                lluvia=data.get('rain', {}).get('1h', 0.0),
+                clima=clima,
+                viento_kmh=round(data.get('wind_speed', 0) * 3.6, 2)
+            )
+            return muestra, diario
 
         except requests.exceptions.RequestException as e:
             logger.error(f"Error en la petición a la API: {e}")
         except (KeyError, IndexError) as e:
             logger.error(f"Error procesando la respuesta de la API. Estructura inesperada: {e}")
         
-        return None
+        return None, diario
+
+    def obtener_datos_actuales(self) -> WeatherSample | None:
+        """
+        Obtiene los datos meteorológicos actuales desde la API de OpenWeatherMap.
+        Retorna un WeatherSample con los datos o None si ocurre un error.
+        """
+        return self.obtener_datos()[0]
 
     def ejecutar(self):
         """
-        Orquesta el proceso completo: obtiene los datos y los guarda en la BD.
+        Orquesta el proceso completo: obtiene los datos y los acumula para
+        guardarlos en la BD en lotes de 'tamano_lote' registros.
         """
         logger.info("Ejecutando ciclo de recolección...")
         datos = self.obtener_datos_actuales()
         if datos:
-            # Capturamos el ID del registro insertado
-            clima_id = self.db.insert_historico_clima(
-                datos['timestamp'],
-                datos['temperatura'],
-                datos['humedad'],
-                datos['lluvia'],
-                datos['clima'],
-                round(datos['viento_kmh'], 2)
-            )
-            # Verificamos si la inserción tuvo éxito (si obtuvimos un ID)
-            if clima_id:
-                logger.info(f"Ciclo de recolección finalizado. Registro guardado con ID: {clima_id}")
-            else:
-                logger.error("El ciclo de recolección falló al intentar guardar los datos en la BD.")
+            self._pending.append((
+                datos.timestamp,
+                datos.temperatura,
+                datos.humedad,
+                datos.lluvia,
+                datos.clima,
+                datos.viento_kmh
+            ))
+            if len(self._pending) >= self.tamano_lote:
+                self.vaciar_pendientes()
         else:
             logger.error("No se pudieron obtener datos, el ciclo de recolección falló.")
 
+    def vaciar_pendientes(self) -> int:
+        """
+        Escribe en la BD, en una única transacción, los registros acumulados.
+        Debe llamarse también al detener el colector para no perder datos.
+        Retorna el número de registros guardados.
+        """
+        if not self._pending:
+            return 0
+        guardados = self.db.insert_historico_clima_batch(self._pending)
+        # Si la inserción falla se conservan los registros para el siguiente intento
+        if guardados is None:
+            logger.error("El ciclo de recolección falló al intentar guardar los datos en la BD.")
+            return 0
+        self._pending.clear()
+        logger.info(f"Ciclo de recolección finalizado. {guardados} registro(s) guardado(s).")
+        return guardados
+
 if __name__ == '__main__':
+    # Sólo el modo script necesita leer la configuración
+    from config import cargar_config
+
     # Ejemplo de cómo se usaría la nueva clase desde un orquestador
     try:
-        with open('config.yaml', 'r') as f:
-            config = yaml.safe_load(f)
+        config = cargar_config('config.yaml')
 
         # La conexión a la BD se maneja con un gestor de contexto
         with DBManager(db_name=config.get('db_name', 'clima_alerta.db')) as db:
@@ -119,7 +163,10 @@ if __name__ == '__main__':
                 tz_str=config['zona_horaria']
             )
             
-            colector.ejecutar()
+            try:
+                colector.ejecutar()
+            finally:
+                colector.vaciar_pendientes()
 
     except (FileNotFoundError, KeyError) as e:
         logger.critical(f"No se pudo cargar la configuración o una clave necesaria no existe: {e}")
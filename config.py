@@ -0,0 +1,38 @@
+# config.py
+
+import copy
+import os
+from collections import OrderedDict
+import yaml
+
+# Cargador en C (libyaml) si PyYAML se compiló con él; si no, el de Python puro
+try:
+    from yaml import CSafeLoader as _Loader
+except ImportError:
+    from yaml import SafeLoader as _Loader
+
+# Caché de configuraciones ya parseadas: path -> (mtime, tamaño, dict)
+_MAX_ENTRADAS = 8
+_CACHE: "OrderedDict[str, tuple[float, int, dict]]" = OrderedDict()
+
+def cargar_config(path='config.yaml') -> dict:
+    """
+    Devuelve la configuración del archivo YAML indicado. El resultado se cachea
+    y sólo se vuelve a leer del disco cuando cambian su fecha de modificación o su tamaño.
+    Cada llamada recibe una copia, por lo que modificarla no altera la caché.
+    Lanza FileNotFoundError si el archivo no existe.
+    """
+    st = os.stat(path)
+    entrada = _CACHE.get(path)
+    if entrada and entrada[0] == st.st_mtime and entrada[1] == st.st_size:
+        _CACHE.move_to_end(path)
+        return copy.deepcopy(entrada[2])
+
+    with open(path, 'rb') as f:
+        config = yaml.load(f, Loader=_Loader)
+
+    _CACHE[path] = (st.st_mtime, st.st_size, config)
+    _CACHE.move_to_end(path)
+    if len(_CACHE) > _MAX_ENTRADAS:
+        _CACHE.popitem(last=False)
+    return copy.deepcopy(config)
@@ -1,8 +1,23 @@
 # db_manager.py
 
 import sqlite3
+import threading
+from contextlib import contextmanager
+import numpy as np
 from logger import logger
 
+# Sentencias de uso frecuente. Al usar siempre el mismo texto SQL, sqlite3 encuentra
+# la sentencia ya preparada en su caché ('cached_statements') y no la vuelve a compilar.
+SQL_INSERT_HISTORICO = '''INSERT INTO historico (timestamp, temperatura, humedad, lluvia, clima, viento_kmh)
+                          VALUES (?, ?, ?, ?, ?, ?)'''
+SQL_INSERT_ALERTA = '''INSERT INTO alertas_emitidas (tipo_alerta, descripcion, clima_id)
+                       VALUES (?, ?, ?)'''
+SQL_INSERT_FEEDBACK = '''INSERT INTO feedback_usuario (alerta_id, feedback) VALUES (?, ?)'''
+SQL_RESUMEN_ESTADO = '''SELECT
+                            COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'historico'),
+                                     (SELECT COUNT(*) FROM historico)),
+                            (SELECT timestamp FROM historico ORDER BY id DESC LIMIT 1)'''
+
 class DBManager:
     """
     Gestor de base de datos SQLite con manejo de contexto para asegurar
@@ -11,12 +26,18 @@ class DBManager:
     def __init__(self, db_name="clima_alerta.db"):
         self.db_name = db_name
         self.conn = None
+        # Las tareas del scheduler comparten la conexión desde hilos distintos: el cerrojo
+        # impide que una consulta se cuele dentro de la transacción abierta por otro hilo.
+        self._lock = threading.RLock()
 
     def __enter__(self):
         """Establece la conexión a la BD y crea las tablas si no existen."""
         try:
-            self.conn = sqlite3.connect(self.db_name)
+            # isolation_level=None: autocommit; las transacciones se abren explícitamente en _transaccion()
+            self.conn = sqlite3.connect(self.db_name, cached_statements=256,
+                                        isolation_level=None, check_same_thread=False)
             logger.info(f"Conexión abierta con la base de datos '{self.db_name}'")
+            self._configure_connection()
             self._create_tables()
             return self
         except sqlite3.Error as e:
@@ -29,44 +50,78 @@ class DBManager:
             self.conn.close()
             logger.info(f"Conexión con la base de datos '{self.db_name}' cerrada.")
 
+    def _configure_connection(self):
+        """
+        Ajusta la conexión para escrituras frecuentes: el modo WAL permite que el bot
+        lea mientras el colector escribe y 'synchronous=NORMAL' evita un fsync por commit.
+        """
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA temp_store=MEMORY")
+        self.conn.execute("PRAGMA mmap_size=268435456")  # 256 MB
+        self.conn.execute("PRAGMA cache_size=-20000")    # ~20 MB de caché de páginas
+
+    @contextmanager
+    def _transaccion(self):
+        """
+        Abre una transacción de escritura explícita (BEGIN IMMEDIATE) y la confirma
+        al salir, o la revierte si ocurre cualquier excepción.
+        """
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self.conn
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+            else:
+                self.conn.execute("COMMIT")
+
     def _create_tables(self):
         """Define y crea todas las tablas necesarias con las relaciones correctas."""
         logger.info("Verificando/creando tablas...")
         try:
-            with self.conn:
-                # La tabla 'historico' guardará todos los registros climáticos
-                self.conn.execute('''
-                    CREATE TABLE IF NOT EXISTS historico (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        timestamp DATETIME,
-                        temperatura REAL,
-                        humedad INTEGER,
-                        lluvia REAL,
-                        clima TEXT,
-                        viento_kmh REAL
-                    )
-                ''')
-                # La tabla 'alertas_emitidas' ahora se relaciona con un registro climático específico
-                self.conn.execute('''
-                    CREATE TABLE IF NOT EXISTS alertas_emitidas (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-                        tipo_alerta TEXT,
-                        descripcion TEXT,
-                        clima_id INTEGER,
-                        FOREIGN KEY (clima_id) REFERENCES historico (id)
-                    )
-                ''')
-                # La tabla 'feedback_usuario' se relaciona con una alerta específica
-                self.conn.execute('''
-                    CREATE TABLE IF NOT EXISTS feedback_usuario (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-                        alerta_id INTEGER NOT NULL,
-                        feedback TEXT NOT NULL,
-                        FOREIGN KEY (alerta_id) REFERENCES alertas_emitidas (id)
-                    )
-                ''')
+            # Sin transacción explícita: en autocommit, CREATE ... IF NOT EXISTS sobre
+            # objetos que ya existen no toma el bloqueo de escritura, así que abrir un
+            # DBManager no espera a otra conexión que esté escribiendo.
+
+            # La tabla 'historico' guardará todos los registros climáticos
+            self.conn.execute('''
+                CREATE TABLE IF NOT EXISTS historico (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    timestamp DATETIME,
+                    temperatura REAL,
+                    humedad INTEGER,
+                    lluvia REAL,
+                    clima TEXT,
+                    viento_kmh REAL
+                )
+            ''')
+            # La tabla 'alertas_emitidas' ahora se relaciona con un registro climático específico
+            self.conn.execute('''
+                CREATE TABLE IF NOT EXISTS alertas_emitidas (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+                    tipo_alerta TEXT,
+                    descripcion TEXT,
+                    clima_id INTEGER,
+                    FOREIGN KEY (clima_id) REFERENCES historico (id)
+                )
+            ''')
+            # La tabla 'feedback_usuario' se relaciona con una alerta específica
+            self.conn.execute('''
+                CREATE TABLE IF NOT EXISTS feedback_usuario (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+                    alerta_id INTEGER NOT NULL,
+                    feedback TEXT NOT NULL,
+                    FOREIGN KEY (alerta_id) REFERENCES alertas_emitidas (id)
+                )
+            ''')
+            # Índices para las consultas del bot y los JOIN de entrenamiento
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_historico_ts ON historico (timestamp DESC)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_alertas_clima ON alertas_emitidas (clima_id)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_feedback_alerta ON feedback_usuario (alerta_id)")
             logger.info("Tablas verificadas correctamente.")
         except sqlite3.Error as e:
             logger.error(f"Error creando tablas: {e}")
@@ -74,7 +129,7 @@ class DBManager:
     def _execute_write_query(self, query, params=(), log_success_msg=""):
         """Ejecuta una consulta de escritura (INSERT, UPDATE) y devuelve el ID de la fila insertada."""
         try:
-            with self.conn:
+            with self._transaccion():
                 cursor = self.conn.execute(query, params)
             if log_success_msg:
                 logger.info(log_success_msg)
@@ -83,44 +138,108 @@ class DBManager:
             logger.error(f"Error en consulta de escritura: {e} | Query: {query}")
             return None
 
+    def _execute_write_many(self, query, rows, log_success_msg=""):
+        """
+        Ejecuta una consulta de escritura para varias filas dentro de una única
+        transacción y devuelve el número de filas afectadas.
+        """
+        try:
+            with self._transaccion():
+                cursor = self.conn.executemany(query, rows)
+            if log_success_msg:
+                logger.info(log_success_msg.format(n=cursor.rowcount))
+            return cursor.rowcount
+        except sqlite3.Error as e:
+            logger.error(f"Error en escritura por lotes: {e} | Query: {query}")
+            return None
+
     def execute_select_query(self, query, params=()):
         """Ejecuta una consulta SELECT y devuelve todos los resultados."""
         try:
-            cursor = self.conn.cursor()
-            cursor.execute(query, params)
-            return cursor.fetchall()
+            with self._lock:
+                cursor = self.conn.cursor()
+                cursor.execute(query, params)
+                return cursor.fetchall()
         except sqlite3.Error as e:
             logger.error(f"Error en consulta SELECT: {e} | Query: {query}")
             return None
 
+    def iter_select_query(self, query, params=(), tamano_lote=4096):
+        """
+        Ejecuta una consulta SELECT y devuelve sus resultados por lotes de hasta
+        'tamano_lote' filas (fetchmany), sin materializar toda la tabla en memoria.
+        A diferencia de execute_select_query, relanza los errores tras registrarlos.
+        """
+        try:
+            # El cerrojo se mantiene hasta agotar (o cerrar) el generador
+            with self._lock:
+                cursor = self.conn.cursor()
+                cursor.arraysize = tamano_lote
+                cursor.execute(query, params)
+                while lote := cursor.fetchmany():
+                    yield lote
+        except sqlite3.Error as e:
+            logger.error(f"Error en consulta SELECT por lotes: {e} | Query: {query}")
+            raise
+
+    def get_historico_arrays(self):
+        """
+        Lee las columnas numéricas del histórico directamente en arrays float32
+        (un array por columna, en orden de ID), listos para NumPy/scikit-learn.
+        Los valores NULL se convierten en NaN. Retorna None si hay un error.
+        """
+        columnas = ('temperatura', 'humedad', 'lluvia', 'viento_kmh')
+        try:
+            with self._lock:
+                # Se fija el último ID para que filas insertadas a mitad de la lectura no descuadren 'n'
+                n, max_id = self.conn.execute("SELECT COUNT(*), IFNULL(MAX(id), 0) FROM historico").fetchone()
+                arrays = {}
+                for col in columnas:
+                    cursor = self.conn.execute(f"SELECT {col} FROM historico WHERE id <= ? ORDER BY id", (max_id,))
+                    arrays[col] = np.fromiter(
+                        (np.nan if v is None else v for (v,) in cursor), dtype=np.float32, count=n
+                    )
+            return arrays
+        except (sqlite3.Error, ValueError) as e:
+            logger.error(f"Error leyendo el histórico en columnas: {e}")
+            return None
+
     def insert_historico_clima(self, timestamp, temperatura, humedad, lluvia, clima, viento_kmh):
         """Inserta un nuevo registro de clima en la tabla histórica y devuelve su ID."""
-        query = '''INSERT INTO historico (timestamp, temperatura, humedad, lluvia, clima, viento_kmh)
-                   VALUES (?, ?, ?, ?, ?, ?)'''
         params = (timestamp, temperatura, humedad, lluvia, clima, viento_kmh)
-        return self._execute_write_query(query, params, "Datos de clima insertados en histórico.")
+        return self._execute_write_query(SQL_INSERT_HISTORICO, params)
+
+    def insert_historico_clima_batch(self, rows):
+        """
+        Inserta varios registros de clima en una sola transacción.
+        Cada fila es una tupla (timestamp, temperatura, humedad, lluvia, clima, viento_kmh).
+        """
+        return self._execute_write_many(SQL_INSERT_HISTORICO, rows, "{n} registros de clima insertados en histórico.")
 
     def insert_alerta_emitida(self, tipo_alerta, descripcion, clima_id):
         """Inserta una nueva alerta, asociándola con un registro de clima."""
-        query = '''INSERT INTO alertas_emitidas (tipo_alerta, descripcion, clima_id)
-                   VALUES (?, ?, ?)'''
-        return self._execute_write_query(query, (tipo_alerta, descripcion, clima_id), f"Alerta '{tipo_alerta}' registrada.")
+        return self._execute_write_query(SQL_INSERT_ALERTA, (tipo_alerta, descripcion, clima_id), f"Alerta '{tipo_alerta}' registrada.")
 
     def insert_feedback(self, alerta_id, feedback):
         """Inserta el feedback de un usuario para una alerta específica."""
-        query = '''INSERT INTO feedback_usuario (alerta_id, feedback) VALUES (?, ?)'''
-        return self._execute_write_query(query, (alerta_id, feedback), "Feedback de usuario registrado.")
+        return self._execute_write_query(SQL_INSERT_FEEDBACK, (alerta_id, feedback), "Feedback de usuario registrado.")
+
+    def insert_feedback_batch(self, rows):
+        """Inserta varios feedbacks (tuplas alerta_id, feedback) en una sola transacción."""
+        return self._execute_write_many(SQL_INSERT_FEEDBACK, rows, "{n} feedbacks de usuario registrados.")
 
     def get_status_summary(self):
         """Consulta un resumen del estado del sistema para el bot."""
         summary = {"total": 0, "ultimo": "N/A"}
         try:
-            # Usamos el método genérico para leer de forma segura
-            total_res = self.execute_select_query("SELECT COUNT(*) FROM historico")
-            if total_res: summary["total"] = total_res[0][0]
-            
-            ultimo_res = self.execute_select_query("SELECT timestamp FROM historico ORDER BY id DESC LIMIT 1")
-            if ultimo_res: summary["ultimo"] = ultimo_res[0][0]
+            # Usamos el método genérico para leer de forma segura, en una sola consulta.
+            # El contador de AUTOINCREMENT da el total en O(1); COALESCE sólo recurre
+            # a COUNT(*) si la tabla aún no tiene entrada en sqlite_sequence.
+            res = self.execute_select_query(SQL_RESUMEN_ESTADO)
+            if res:
+                total, ultimo = res[0]
+                summary["total"] = total
+                if ultimo is not None: summary["ultimo"] = ultimo
             
             return summary
         except Exception as e:
@@ -1,8 +1,9 @@
 # forecast_colector.py
 
+import numpy as np
 import requests
-import yaml
 from logger import logger
+from sesion_http import crear_sesion
 from datetime import datetime
 from zoneinfo import ZoneInfo, ZoneInfoNotFoundError # <--- CAMBIO: Usando la librería estándar
 
@@ -24,13 +25,24 @@ class ForecastColector:
             raise ForecastCollectorError(f"La zona horaria '{tz_str}' no es válida.")
         
         self.api_base_url = "https://api.openweathermap.org/data/3.0/onecall"
+        # Sesión persistente: evita un handshake TCP+TLS nuevo en cada consulta
+        self.session = crear_sesion()
         logger.info("ForecastColector inicializado correctamente.")
 
-    def get_forecast(self) -> list | None:
+    def get_forecast(self, daily: list | None = None) -> list | None:
         """
         Obtiene el pronóstico extendido de la API de OpenWeatherMap.
+        Si se recibe 'daily' (la sección ya descargada, p. ej. por Colector.obtener_datos)
+        sólo se procesa, sin hacer una nueva petición.
         Retorna una lista de diccionarios (uno por día) o None si hay un error.
         """
+        if daily is not None:
+            try:
+                return self._procesar_diario(daily)
+            except (KeyError, IndexError) as e:
+                logger.error(f"Error procesando el pronóstico recibido. Estructura inesperada: {e}")
+                return None
+
         params = {
             "lat": self.lat,
             "lon": self.lon,
@@ -41,34 +53,15 @@ class ForecastColector:
         }
 
         try:
-            response = requests.get(self.api_base_url, params=params, timeout=15)
+            response = self.session.get(self.api_base_url, params=params, timeout=(3, 15))
             response.raise_for_status() # Lanza un error para códigos 4xx o 5xx
             data = response.json()
 
-            forecast_data = []
             if 'daily' not in data:
                 logger.warning("La respuesta de la API no contiene el pronóstico 'daily'.")
                 return []
 
-            for daily_data in data['daily']:
-                # Conversión de timestamp usando zoneinfo
-                dt_local = datetime.fromtimestamp(daily_data['dt'], tz=self.tz)
-                
-                # Análisis más seguro de la descripción del clima
-                weather_info = daily_data.get('weather', [])
-                clima = weather_info[0]['description'].capitalize() if weather_info else "No disponible"
-                
-                forecast_data.append({
-                    'fecha': dt_local.date(), # Devolvemos un objeto 'date' para mayor flexibilidad
-                    'temp_max': daily_data.get('temp', {}).get('max'),
-                    'temp_min': daily_data.get('temp', {}).get('min'),
-                    'humedad': daily_data.get('humidity'),
-                    'lluvia': daily_data.get('rain', 0), # Obtiene la lluvia o 0 si no existe
-                    'clima': clima
-                })
-
-            logger.info(f"Pronóstico extendido descargado: {len(forecast_data)} días.")
-            return forecast_data
+            return self._procesar_diario(data['daily'])
 
         except requests.exceptions.Timeout:
             logger.error("Error obteniendo pronóstico: La petición a la API tardó demasiado.")
@@ -79,11 +72,43 @@ class ForecastColector:
         
         return None
 
+    def _procesar_diario(self, daily: list) -> list:
+        """Convierte la sección 'daily' de la API en una lista de diccionarios (uno por día)."""
+        if not daily:
+            return []
+
+        # Conversión de todos los timestamps a fechas locales de una sola vez.
+        # El 'dt' de cada día corresponde a media jornada, así que un cambio de horario
+        # dentro del periodo no altera la fecha: basta el desfase de la zona en el primer día.
+        ts = np.fromiter((d['dt'] for d in daily), dtype=np.int64, count=len(daily))
+        desfase = int(datetime.fromtimestamp(int(ts[0]), tz=self.tz).utcoffset().total_seconds())
+        fechas = ((ts + desfase) // 86400).astype('datetime64[D]').tolist()
+
+        forecast_data = []
+        for daily_data, fecha in zip(daily, fechas):
+            # Análisis más seguro de la descripción del clima
+            weather_info = daily_data.get('weather', [])
+            clima = weather_info[0]['description'].capitalize() if weather_info else "No disponible"
+            
+            forecast_data.append({
+                'fecha': fecha, # Devolvemos un objeto 'date' para mayor flexibilidad
+                'temp_max': daily_data.get('temp', {}).get('max'),
+                'temp_min': daily_data.get('temp', {}).get('min'),
+                'humedad': daily_data.get('humidity'),
+                'lluvia': daily_data.get('rain', 0), # Obtiene la lluvia o 0 si no existe
+                'clima': clima
+            })
+
+        logger.info(f"Pronóstico extendido procesado: {len(forecast_data)} días.")
+        return forecast_data
+
 if __name__ == '__main__':
+    # Sólo el modo script necesita leer la configuración
+    from config import cargar_config
+
     # Ejemplo de cómo se usaría la nueva clase
     try:
-        with open('config.yaml', 'r') as f:
-            config = yaml.safe_load(f)
+        config = cargar_config('config.yaml')
 
         fc = ForecastColector(
             api_key=config['openweathermap_api_key'],
@@ -16,8 +16,11 @@ logger.add(sys.stdout,
            colorize=True,
            format="<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level}</level> | {message}")
 
-# Sink para el archivo, ahora gestionado por loguru
+# Sink para el archivo, ahora gestionado por loguru.
+# 'enqueue=True' delega la escritura a un hilo en segundo plano para no bloquear
+# a quien registra el mensaje (por ejemplo, el event loop del bot).
 logger.add(log_file_path,
+           enqueue=True,
            rotation="00:00",  # Rota el archivo cada día a medianoche
            retention="7 days",
            compression="zip",
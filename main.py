@@ -1,9 +1,13 @@
 # main.py (Versión Final con Tareas Consistentes)
 
-import yaml
+import atexit
+import functools
 import sqlite3
+import time
 from logger import logger
+from config import cargar_config
 from apscheduler.schedulers.blocking import BlockingScheduler
+from apscheduler.executors.pool import ThreadPoolExecutor
 
 # --- Importamos TODAS las clases necesarias ---
 from db_manager import DBManager
@@ -14,64 +18,123 @@ from analizador import Analizador
 from modelo_adaptativo import ModeloAdaptativo
 from predictor import Predictor
 
+# Antigüedad máxima con la que la tarea de pronóstico reutiliza el pronóstico
+# descargado en el ciclo principal, evitando otra llamada a la API.
+EDAD_MAX_PRONOSTICO_S = 3600
+
+def _obtener_predictor(estado_modelo):
+    """
+    Devuelve el Predictor compartido entre ciclos. ModeloAdaptativo.cargar_modelo()
+    devuelve la misma instancia mientras el archivo no cambie, así que el Predictor
+    sólo se reconstruye tras un re-entrenamiento.
+    """
+    modelo = ModeloAdaptativo.cargar_modelo()
+    predictor = estado_modelo['predictor']
+    if predictor is None or modelo is not predictor.modelo:
+        predictor = estado_modelo['predictor'] = Predictor(modelo_cargado=modelo)
+    return predictor
+
+def _parametros_api(config):
+    """Parámetros de la configuración con los que se construyen los colectores."""
+    return (config.get('openweathermap_api_key'), config.get('lat'),
+            config.get('lon'), config.get('zona_horaria'))
+
+def _obtener_colector(db, config, estado_colector):
+    """
+    Devuelve el Colector compartido entre ciclos, conservando su sesión HTTP. Sólo se
+    reconstruye si cambian la API key, las coordenadas o la zona horaria de la configuración;
+    en ese caso se cierra la sesión del Colector anterior.
+    """
+    parametros = _parametros_api(config)
+    colector = estado_colector['colector']
+    if colector is None or parametros != estado_colector['parametros']:
+        nuevo = Colector(db, *parametros)
+        if colector is not None:
+            colector.vaciar_pendientes()
+            colector.session.close()
+        colector = estado_colector['colector'] = nuevo
+        estado_colector['parametros'] = parametros
+    return colector
+
+def _obtener_forecast_colector(config, estado_forecast):
+    """
+    Devuelve el ForecastColector compartido entre ciclos; igual que _obtener_colector,
+    sólo se reconstruye (cerrando la sesión anterior) si cambian sus parámetros.
+    """
+    parametros = _parametros_api(config)
+    forecast_colector = estado_forecast['colector']
+    if forecast_colector is None or parametros != estado_forecast['parametros']:
+        nuevo = ForecastColector(*parametros)
+        if forecast_colector is not None:
+            forecast_colector.session.close()
+        forecast_colector = estado_forecast['colector'] = nuevo
+        estado_forecast['parametros'] = parametros
+    return forecast_colector
+
 # --- Funciones de Tareas para el Scheduler ---
 
-def tarea_ciclo_principal():
+def tarea_ciclo_principal(db, notifier, estado_colector, estado_modelo, pronostico_reciente):
     """Tarea principal: recolecta y analiza los datos actuales."""
     logger.info("--- ⏰ INICIANDO CICLO PRINCIPAL DE MONITOREO ---")
     try:
         # Carga la configuración más reciente en cada ejecución
         try:
-            with open('config_dinamico.yaml', 'r') as f: config = yaml.safe_load(f)
+            config = cargar_config('config_dinamico.yaml')
         except FileNotFoundError:
-            with open('config.yaml', 'r') as f: config = yaml.safe_load(f)
-
-        with DBManager(config.get('db_name')) as db:
-            # Instanciamos los componentes necesarios para este ciclo
-            notifier = Notifier()
-            colector = Colector(db, config.get('openweathermap_api_key'), config.get('lat'), config.get('lon'), config.get('zona_horaria'))
-            modelo = ModeloAdaptativo.cargar_modelo()
-            predictor = Predictor(modelo_cargado=modelo)
-            analizador = Analizador(db, notifier, predictor, config.get('umbrales', {}))
-            
-            datos = colector.obtener_datos_actuales()
-            if datos:
-                analizador.analizar(datos)
+            config = cargar_config('config.yaml')
+
+        # Instanciamos los componentes que dependen de la configuración de este ciclo
+        colector = _obtener_colector(db, config, estado_colector)
+        predictor = _obtener_predictor(estado_modelo)
+        analizador = Analizador(db, notifier, predictor, config.get('umbrales', {}))
+        
+        datos, diario = colector.obtener_datos()
+        if diario is not None:
+            # Una sola asignación: la tarea de pronóstico, en otro hilo, nunca ve una mezcla
+            pronostico_reciente['ultimo'] = (estado_colector['parametros'], time.monotonic(), diario)
+        if datos:
+            analizador.analizar(datos)
 
     except Exception as e:
         logger.critical(f"Error no controlado en el ciclo principal: {e}", exc_info=True)
     logger.info("--- 🏁 FIN DEL CICLO PRINCIPAL DE MONITOREO ---")
 
 
-def tarea_analisis_pronostico():
+def tarea_analisis_pronostico(db, notifier, estado_forecast, pronostico_reciente):
     """Tarea periódica: obtiene y analiza el pronóstico del tiempo."""
     logger.info("--- ⛅ INICIANDO CICLO DE ANÁLISIS DE PRONÓSTICO ---")
     try:
-        with open('config.yaml', 'r') as f:
-            config = yaml.safe_load(f)
-
-        with DBManager(config.get('db_name')) as db:
-            notifier = Notifier()
-            forecast_colector = ForecastColector(config.get('openweathermap_api_key'), config.get('lat'), config.get('lon'), config.get('zona_horaria'))
-            # Para esta tarea, el predictor de riesgo actual no es necesario
-            analizador = Analizador(db, notifier, predictor=None, umbrales=config.get('umbrales', {}))
-
-            pronostico = forecast_colector.get_forecast()
-            if pronostico:
-                analizador.analizar_pronostico(pronostico)
+        config = cargar_config('config.yaml')
+        forecast_colector = _obtener_forecast_colector(config, estado_forecast)
+
+        # Para esta tarea, el predictor de riesgo actual no es necesario
+        analizador = Analizador(db, notifier, predictor=None, umbrales=config.get('umbrales', {}))
+
+        # Sólo se reutiliza si es reciente y corresponde a la misma ubicación y API key:
+        # el ciclo principal puede leer otros valores desde config_dinamico.yaml
+        diario = None
+        ultimo = pronostico_reciente['ultimo']
+        if ultimo is not None:
+            parametros, obtenido, diario_reciente = ultimo
+            if (parametros == estado_forecast['parametros']
+                    and time.monotonic() - obtenido < EDAD_MAX_PRONOSTICO_S):
+                logger.info("Reutilizando el pronóstico descargado en el ciclo principal.")
+                diario = diario_reciente
+        pronostico = forecast_colector.get_forecast(diario)
+        if pronostico:
+            analizador.analizar_pronostico(pronostico)
 
     except Exception as e:
         logger.critical(f"Error no controlado en el ciclo de pronóstico: {e}", exc_info=True)
     logger.info("--- 🏁 FIN DEL CICLO DE ANÁLISIS DE PRONÓSTICO ---")
 
 
-def tarea_reentrenamiento_modelo():
+def tarea_reentrenamiento_modelo(db):
     """Tarea programada: re-entrena el modelo de ML."""
     logger.info("--- 🧠 INICIANDO TAREA DE RE-ENTRENAMIENTO ---")
     try:
-        with DBManager() as db:
-            entrenador = ModeloAdaptativo(db_manager=db)
-            entrenador.entrenar_y_guardar()
+        entrenador = ModeloAdaptativo(db_manager=db)
+        entrenador.entrenar_y_guardar()
     except Exception as e:
         logger.critical(f"El proceso de re-entrenamiento falló: {e}", exc_info=True)
     logger.info("--- ✅ FIN DE LA TAREA DE RE-ENTRENAMIENTO ---")
@@ -80,23 +143,45 @@ def tarea_reentrenamiento_modelo():
 def run():
     """Punto de entrada: Configura e inicia el scheduler con todas las tareas."""
     try:
-        with open('config.yaml', 'r') as f:
-            config = yaml.safe_load(f)
+        config = cargar_config('config.yaml')
         
-        scheduler = BlockingScheduler(timezone='UTC')
+        # Con tres tareas bastan 4 hilos (por defecto son 10). Una ejecución que se
+        # retrase hasta 60 s (por defecto 1 s) aún se lanza en lugar de descartarse.
+        scheduler = BlockingScheduler(
+            timezone='UTC',
+            executors={'default': ThreadPoolExecutor(max_workers=4)},
+            job_defaults={'misfire_grace_time': 60}
+        )
         umbrales = config.get('umbrales', {})
 
+        # Componentes compartidos por todas las ejecuciones de las tareas.
+        # Una sola conexión a la BD durante toda la vida del proceso, en lugar de
+        # abrirla (y reaplicar los PRAGMA) en cada ciclo.
+        db = DBManager(config.get('db_name')).__enter__()
+        atexit.register(db.__exit__, None, None, None)
+        notifier = Notifier()
+        estado_forecast = {'colector': None, 'parametros': None}
+        _obtener_forecast_colector(config, estado_forecast)
+        estado_colector = {'colector': None, 'parametros': None}
+        _obtener_colector(db, config, estado_colector)
+        estado_modelo = {'predictor': None}
+        # Pronóstico diario descargado junto con el clima actual en el ciclo principal:
+        # 'ultimo' guarda (parámetros del Colector, instante monotónico, sección 'daily')
+        pronostico_reciente = {'ultimo': None}
+
         # Tarea #1: Ciclo principal
         minutos = int(umbrales.get('intervalo_consulta_min', 30))
-        scheduler.add_job(tarea_ciclo_principal, 'interval', minutes=minutos, id='ciclo_principal')
+        tarea_principal = functools.partial(tarea_ciclo_principal, db, notifier, estado_colector, estado_modelo, pronostico_reciente)
+        scheduler.add_job(tarea_principal, 'interval', minutes=minutos, id='ciclo_principal')
         logger.info(f"Tarea de monitoreo principal programada cada {minutos} minutos.")
 
         # Tarea #2: Análisis de pronóstico
-        scheduler.add_job(tarea_analisis_pronostico, 'interval', hours=6, id='analisis_pronostico')
+        tarea_pronostico = functools.partial(tarea_analisis_pronostico, db, notifier, estado_forecast, pronostico_reciente)
+        scheduler.add_job(tarea_pronostico, 'interval', hours=6, id='analisis_pronostico')
         logger.info("Tarea de análisis de pronóstico programada cada 6 horas.")
 
         # Tarea #3: Re-entrenamiento del modelo
-        scheduler.add_job(tarea_reentrenamiento_modelo, 'cron', day_of_week='sun', hour=3, id='reentrenamiento_semanal')
+        scheduler.add_job(functools.partial(tarea_reentrenamiento_modelo, db), 'cron', day_of_week='sun', hour=3, id='reentrenamiento_semanal')
         logger.info("Tarea de re-entrenamiento del modelo programada para cada domingo a las 03:00 UTC.")
         
         print("\n>>> Servicio de Monitoreo y Alertas iniciado. Presiona Ctrl+C para detener. <<<\n")
@@ -1,14 +1,26 @@
 # modelo_adaptativo.py
 
+import functools
+import os
+import pickle
 import numpy as np
 import joblib
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import classification_report
 from logger import logger
 from db_manager import DBManager # <-- Importamos nuestro gestor
 
 MODELO_FILE = "modelo_riesgo.pkl"
+TAMANO_LOTE_ENTRENAMIENTO = 4096
+
+@functools.lru_cache(maxsize=1)
+def _cargar_modelo_cacheado(path, mtime_ns):
+    """
+    Carga el modelo con joblib. La fecha de modificación forma parte de la clave de la
+    caché: mientras el archivo no cambie se devuelve la misma instancia sin volver a
+    leerlo, y tras un re-entrenamiento la clave cambia y se carga el modelo nuevo.
+    """
+    modelo = joblib.load(path)
+    logger.info(f"Modelo cargado desde '{path}'.")
+    return modelo
 
 class ModeloAdaptativo:
     """
@@ -33,25 +45,42 @@ class ModeloAdaptativo:
             JOIN
                 historico h ON a.clima_id = h.id
             WHERE
-                h.temperatura IS NOT NULL AND f.feedback IN ('bien', 'mal')
+                h.temperatura IS NOT NULL AND h.humedad IS NOT NULL AND h.lluvia IS NOT NULL
+                AND f.feedback IN ('bien', 'mal')
         """
         try:
-            registros = self.db.execute_select_query(query)
-            if not registros:
+            # Las filas se leen por lotes y se vuelcan en arrays tipados que duplican su
+            # capacidad cuando se llenan, sin materializar la lista completa de tuplas.
+            # Los árboles de scikit-learn trabajan en float32: entregarlo así evita una copia al entrenar
+            X = np.empty((TAMANO_LOTE_ENTRENAMIENTO, 3), dtype=np.float32)
+            y = np.empty(TAMANO_LOTE_ENTRENAMIENTO, dtype=np.int8)
+            n = 0
+            for lote in self.db.iter_select_query(query, tamano_lote=TAMANO_LOTE_ENTRENAMIENTO):
+                m = len(lote)
+                if n + m > len(X):
+                    capacidad = max(2 * len(X), n + m)
+                    X_nuevo = np.empty((capacidad, 3), dtype=np.float32)
+                    y_nuevo = np.empty(capacidad, dtype=np.int8)
+                    X_nuevo[:n], y_nuevo[:n] = X[:n], y[:n]
+                    X, y = X_nuevo, y_nuevo
+                X[n:n + m] = np.fromiter(
+                    (v for fila in lote for v in fila[:3]), dtype=np.float32, count=m * 3
+                ).reshape(m, 3)
+                # Mapeo: 'mal' (hubo un riesgo no detectado o mal evaluado) -> 1
+                # 'bien' (la alerta fue correcta o no hubo nada) -> 0
+                y[n:n + m] = np.fromiter((fila[3] == "mal" for fila in lote), dtype=np.int8, count=m)
+                n += m
+
+            if n == 0:
                 return None, None
+            X, y = X[:n], y[:n]
 
-            X = []
-            y = []
-            for temp, hum, lluvia, feedback in registros:
-                # Asegurarnos de que los datos son numéricos y no nulos
-                if all(v is not None for v in [temp, hum, lluvia]):
-                    X.append([temp, hum, lluvia])
-                    # Mapeo: 'mal' (hubo un riesgo no detectado o mal evaluado) -> 1
-                    # 'bien' (la alerta fue correcta o no hubo nada) -> 0
-                    y.append(1 if feedback == "mal" else 0)
+            # Asegurarnos de que los datos son numéricos (sin NaN)
+            validos = ~np.isnan(X).any(axis=1)
+            X, y = X[validos], y[validos]
 
             logger.info(f"Se cargaron {len(X)} registros de entrenamiento válidos.")
-            return np.array(X), np.array(y)
+            return X, y
         except Exception as e:
             logger.error(f"Error cargando datos de entrenamiento: {e}", exc_info=True)
             return None, None
@@ -60,38 +89,42 @@ class ModeloAdaptativo:
         """
         Orquesta el flujo completo de entrenamiento, evaluación y guardado del modelo.
         """
+        # scikit-learn tarda cientos de ms en importarse; sólo se carga cuando se entrena
+        from sklearn.ensemble import RandomForestClassifier
+
         X, y = self._cargar_datos_entrenamiento()
 
         if X is None or len(X) < 20: # Umbral mínimo de datos para entrenar
             logger.warning(f"No hay suficientes datos ({len(X if X is not None else [])}/20) para entrenar un nuevo modelo.")
             return
 
-        # Dividir los datos manteniendo la proporción de clases (stratify=y)
-        X_train, X_test, y_train, y_test = train_test_split(
-            X, y, test_size=0.25, random_state=42, stratify=y
-        )
-
-        # Inicializar el clasificador con manejo de desbalance de clases
+        # Inicializar el clasificador con manejo de desbalance de clases.
+        # Con tan pocos datos no se reserva un conjunto de prueba: se entrena con todos
+        # y se evalúa con las muestras que cada árbol dejó fuera (out-of-bag).
         self.modelo = RandomForestClassifier(
             n_estimators=100,
             random_state=42,
-            class_weight='balanced' # <-- ¡Mejora clave!
+            class_weight='balanced', # <-- ¡Mejora clave!
+            oob_score=True,
+            n_jobs=-1 # Construye los árboles en paralelo con todos los núcleos disponibles
         )
         
-        self.modelo.fit(X_train, y_train)
+        self.modelo.fit(X, y)
 
         # Evaluar el modelo
-        y_pred = self.modelo.predict(X_test)
-        reporte = classification_report(y_test, y_pred, target_names=['Normal (0)', 'Riesgo (1)'])
-        
-        logger.info("--- Reporte de Clasificación del Modelo ---")
-        # El logger puede no mostrar bien el formato, pero en consola se verá perfecto.
-        print("\n" + reporte) 
-        logger.info("--- Fin del Reporte ---")
+        # Probabilidad de riesgo OOB media para las muestras de cada clase real
+        riesgo_oob = self.modelo.oob_decision_function_[:, 1]
+        logger.info(f"Precisión out-of-bag del modelo: {self.modelo.oob_score_:.2%}")
+        for clase, nombre in ((0, 'Normal (0)'), (1, 'Riesgo (1)')):
+            if (y == clase).any():
+                logger.info(f"Probabilidad de riesgo OOB media para '{nombre}': {np.nanmean(riesgo_oob[y == clase]):.2%}")
 
         # Guardar el modelo entrenado
         try:
-            joblib.dump(self.modelo, MODELO_FILE)
+            # Comprimido (zlib nivel 3): el archivo ocupa varias veces menos y se carga antes.
+            # Un archivo comprimido no se puede mapear con mmap; como el modelo sólo se
+            # recarga cuando cambia, compensa más reducir su tamaño.
+            joblib.dump(self.modelo, MODELO_FILE, compress=3, protocol=pickle.HIGHEST_PROTOCOL)
             logger.info(f"Modelo guardado exitosamente en '{MODELO_FILE}'.")
         except Exception as e:
             logger.error(f"Error al guardar el modelo: {e}")
@@ -100,9 +133,7 @@ class ModeloAdaptativo:
     def cargar_modelo(path=MODELO_FILE):
         """Método estático para cargar el modelo desde cualquier parte de la aplicación."""
         try:
-            modelo = joblib.load(path)
-            logger.info(f"Modelo cargado desde '{path}'.")
-            return modelo
+            return _cargar_modelo_cacheado(path, os.stat(path).st_mtime_ns)
         except FileNotFoundError:
             logger.warning(f"No se encontró un archivo de modelo en '{path}'. Se operará sin modelo predictivo.")
             return None
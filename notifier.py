@@ -1,17 +1,25 @@
 # notifier.py
 
 import requests
-import yaml
 import os
 from logger import logger
-
-# Se importan las clases necesarias para los botones desde la librería de Telegram
-from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+from config import cargar_config
+from sesion_http import crear_sesion
 
 # Definimos una excepción personalizada para errores de configuración
 class NotifierConfigError(Exception):
     pass
 
+def _teclado_feedback(alerta_id: int) -> dict:
+    """
+    Teclado de botones de feedback en el formato JSON de la API de Telegram.
+    Se construye a mano para no importar python-telegram-bot en este proceso.
+    """
+    return {"inline_keyboard": [[
+        {"text": "✅ Predicción Correcta", "callback_data": f"feedback:{alerta_id}:bien"},
+        {"text": "❌ Predicción Incorrecta", "callback_data": f"feedback:{alerta_id}:mal"}
+    ]]}
+
 class Notifier:
     """
     Gestiona el envío de notificaciones a través de la API de Telegram.
@@ -23,6 +31,16 @@ class Notifier:
         """
         self.token, self.chat_id = self._load_credentials(config_path)
         self.api_base_url = f"https://api.telegram.org/bot{self.token}"
+        # Partes fijas de cada envío, calculadas una sola vez
+        self._send_url = f"{self.api_base_url}/sendMessage"
+        self._base_payload = {"chat_id": self.chat_id, "parse_mode": "Markdown", "disable_notification": False}
+        # Sesión persistente: las ráfagas de mensajes reutilizan la misma conexión TLS.
+        # Se reintenta también POST ante 429/5xx: es preferible un aviso duplicado a uno perdido.
+        self.session = crear_sesion(
+            pool_connections=4, pool_maxsize=4, backoff_factor=0.3,
+            status_forcelist=(429, 500, 502, 503, 504),
+            metodos=frozenset({"POST"})
+        )
         logger.info("Notifier inicializado correctamente.")
 
     def _load_credentials(self, config_path):
@@ -39,12 +57,11 @@ class Notifier:
                 return token, chat_id
 
             # Prioridad 2: Archivo de configuración
-            with open(config_path, 'r') as f:
-                config = yaml.safe_load(f)
-                token = config['telegram_token']
-                chat_id = config['telegram_chat_id']
-                logger.info(f"Credenciales de Telegram cargadas desde '{config_path}'.")
-                return token, chat_id
+            config = cargar_config(config_path)
+            token = config['telegram_token']
+            chat_id = config['telegram_chat_id']
+            logger.info(f"Credenciales de Telegram cargadas desde '{config_path}'.")
+            return token, chat_id
                 
         except FileNotFoundError:
             raise NotifierConfigError(f"El archivo de configuración '{config_path}' no fue encontrado.")
@@ -54,24 +71,22 @@ class Notifier:
     def send_message(self, message: str, parse_mode="Markdown", disable_notification=False, reply_markup=None) -> bool:
         """
         Método base para enviar un mensaje a través de la API de Telegram.
-        Acepta un 'reply_markup' opcional para adjuntar teclados de botones.
+        Acepta un 'reply_markup' opcional (diccionario con el formato de la API
+        de Telegram) para adjuntar teclados de botones.
         """
-        url = f"{self.api_base_url}/sendMessage"
-        payload = {
-            "chat_id": self.chat_id,
-            "text": message,
-            "parse_mode": parse_mode,
-            "disable_notification": disable_notification
-        }
+        payload = {**self._base_payload, "text": message}
+        if parse_mode != "Markdown":
+            payload["parse_mode"] = parse_mode
+        if disable_notification:
+            payload["disable_notification"] = True
 
         # --- LÓGICA CORREGIDA ---
         # Solo añadimos el 'reply_markup' al payload si se proporcionó uno.
         if reply_markup:
-            # El objeto InlineKeyboardMarkup debe convertirse a un diccionario.
-            payload['reply_markup'] = reply_markup.to_dict()
+            payload['reply_markup'] = reply_markup
 
         try:
-            response = requests.post(url, json=payload, timeout=10)
+            response = self.session.post(self._send_url, json=payload, timeout=10)
             response.raise_for_status() # Lanza un error para códigos HTTP 4xx o 5xx
             logger.info("Mensaje enviado correctamente a Telegram.")
             return True
@@ -87,13 +102,7 @@ class Notifier:
         Este es el método principal que usará el Analizador.
         """
         logger.warning(f"Enviando alerta general para alerta_id {alerta_id}")
-        keyboard = InlineKeyboardMarkup([
-            [
-                InlineKeyboardButton("✅ Predicción Correcta", callback_data=f"feedback:{alerta_id}:bien"),
-                InlineKeyboardButton("❌ Predicción Incorrecta", callback_data=f"feedback:{alerta_id}:mal")
-            ]
-        ])
-        self.send_message(mensaje, parse_mode="Markdown", reply_markup=keyboard)
+        self.send_message(mensaje, parse_mode="Markdown", reply_markup=_teclado_feedback(alerta_id))
 
     def send_error(self, modulo: str, error: str):
         """Envía una notificación de error del sistema (sin botones)."""
@@ -16,6 +16,8 @@ class Predictor:
         :param modelo_cargado: El objeto del modelo (ej. de scikit-learn) cargado con joblib.
         """
         self.modelo = modelo_cargado
+        # Buffer reutilizado por predecir() para no reservar un array nuevo en cada lectura
+        self._buf = np.empty((1, 3), dtype=np.float32)
         if self.modelo:
             logger.info("Predictor inicializado con un modelo cargado.")
         else:
@@ -33,22 +35,59 @@ class Predictor:
 
         try:
             # Preparar los datos de entrada en el formato correcto para scikit-learn
-            entrada = np.array([[temperatura, humedad, lluvia]])
-            
-            # Realizar la predicción
-            resultado_binario = self.modelo.predict(entrada)[0]
-            probabilidades = self.modelo.predict_proba(entrada)[0]
+            # (float32 es el tipo con el que trabajan internamente los árboles)
+            self._buf[0, 0] = temperatura
+            self._buf[0, 1] = humedad
+            self._buf[0, 2] = lluvia
             
+            # Realizar la predicción con una sola pasada por el modelo (predict_proba).
+            # Las lecturas llegan de la API en JSON, que no admite NaN ni infinito.
+            res = self.predecir_batch(self._buf, valores_finitos=True)
+            if res is None:
+                return None
+            predicciones, probabilidades = res
+            resultado_binario = predicciones[0]
             # La probabilidad de riesgo es la probabilidad de la clase '1'
-            probabilidad_riesgo = probabilidades[1]
+            probabilidad_riesgo = probabilidades[0]
 
-            logger.info(f"Predicción: {'RIESGO' if resultado_binario == 1 else 'NORMAL'}. "
-                        f"Confianza de riesgo: {probabilidad_riesgo:.2%}")
+            # Argumentos diferidos: loguru sólo formatea el mensaje si algún sink acepta el nivel INFO
+            logger.info("Predicción: {}. Confianza de riesgo: {:.2%}",
+                        'RIESGO' if resultado_binario == 1 else 'NORMAL', probabilidad_riesgo)
 
             return resultado_binario, probabilidad_riesgo
             
         except Exception as e:
-            logger.error(f"Error durante la predicción: {e}", exc_info=True)
+            logger.error(f"Error durante la predicción: {e}")
+            return None
+
+    def predecir_batch(self, X: np.ndarray, valores_finitos: bool = False) -> tuple[np.ndarray, np.ndarray] | None:
+        """
+        Realiza predicciones de riesgo para varias lecturas con una sola pasada por el modelo.
+
+        :param X: Array de forma (n, 3) con las columnas temperatura, humedad y lluvia.
+        :param valores_finitos: True sólo si quien llama garantiza que X no contiene NaN ni
+            infinito; en ese caso se omite esa comprobación de scikit-learn.
+        :return: Una tupla (predicciones_binarias, probabilidades_de_riesgo) o None si no hay modelo.
+        """
+        if not self.modelo:
+            logger.error("El modelo no está disponible para realizar predicciones.")
+            return None
+
+        # Import diferido: el modelo cargado con joblib ya trae scikit-learn consigo;
+        # importarlo aquí evita cargarlo al arrancar procesos que aún no predicen.
+        from sklearn import config_context
+
+        try:
+            X = np.asarray(X, dtype=np.float32).reshape(-1, 3)
+            with config_context(assume_finite=valores_finitos):
+                probabilidades = self.modelo.predict_proba(X)
+
+            # predict() es el argmax de predict_proba: derivarlo evita recorrer los árboles dos veces
+            predicciones = np.asarray(self.modelo.classes_).take(probabilidades.argmax(axis=1))
+            return predicciones, probabilidades[:, 1]
+
+        except Exception as e:
+            logger.error(f"Error durante la predicción por lotes: {e}")
             return None
 
 if __name__ == '__main__':
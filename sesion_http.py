@@ -0,0 +1,26 @@
+# sesion_http.py
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+def crear_sesion(pool_connections=2, pool_maxsize=4, reintentos=3, backoff_factor=0.5,
+                 status_forcelist=(502, 503, 504), metodos=Retry.DEFAULT_ALLOWED_METHODS) -> requests.Session:
+    """
+    Crea una sesión HTTP persistente (keep-alive) para reutilizar la conexión TLS
+    entre peticiones, con reintentos automáticos ante errores transitorios del servidor.
+    """
+    sesion = requests.Session()
+    adaptador = HTTPAdapter(
+        pool_connections=pool_connections,
+        pool_maxsize=pool_maxsize,
+        max_retries=Retry(
+            total=reintentos,
+            backoff_factor=backoff_factor,
+            status_forcelist=status_forcelist,
+            allowed_methods=metodos
+        )
+    )
+    sesion.mount("https://", adaptador)
+    sesion.mount("http://", adaptador)
+    return sesion